@@ -1,16 +1,32 @@
-from flask import Flask, render_template, request, jsonify, redirect, session, url_for
+from flask import Flask, Response, render_template, stream_with_context, request, jsonify, redirect, session, url_for
+from jinja2 import FileSystemBytecodeCache
 from user_manage import register_user, user_login, User
 from event_manage import create_event, update_rsvp, get_rsvp_by_user_and_event, get_events_by_host, update_event, delete_event
-from event_manage import add_rsvp, get_event_by_id, remove_rsvp, get_rsvps_by_user, get_rsvp_count, delete_rsvps_for_event, get_events
+from event_manage import add_rsvp, get_event_by_id, remove_rsvp, get_rsvps_by_user, get_rsvp_count, delete_rsvps_for_event
+from event_manage import iter_events, iter_events_by_host, iter_events_by_attendee, iter_search_events
+from event_manage import iter_event_roster, get_event_roster_totals
+from event_manage import get_similar_events, get_recommended_events
 from init import sys_init, get_db_connection
+from compress import compress_response
+from suggest import suggest_index
 from functools import wraps
+import csv
+import io
+import json
+import os
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'
 
-# Initialize the system (create database and tables)
+# Cache compiled templates on disk so a fresh process doesn't recompile them
+JINJA_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jinja_cache')
+os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(JINJA_CACHE_DIR)}
+
+# Initialize the system (create database and tables) and build the search suggestion index
 with app.app_context():
     sys_init()
+    suggest_index.load()
 
 # Decorator to require login
 def login_required(f):
@@ -21,6 +37,23 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Number of template output pieces joined into each chunk of a streamed page
+STREAM_BUFFER_SIZE = 1000
+
+def stream_page(template_name, **context):
+    """Like flask.stream_template, but joins the template output into larger
+    chunks so the server isn't handed one small write per template tag."""
+    template = app.jinja_env.get_template(template_name)
+    app.update_template_context(context)
+    stream = template.stream(context)
+    stream.enable_buffering(STREAM_BUFFER_SIZE)
+    return Response(stream_with_context(stream))
+
+# Compress responses (gzip, or brotli if available) for clients that accept it
+@app.after_request
+def compress(response):
+    return compress_response(response, request.headers.get('Accept-Encoding', ''))
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -89,7 +122,11 @@ def dashboard():
     # Use the unique event IDs to get events
     attending_events = [get_event_by_id(event_id) for event_id in unique_event_ids]
 
-    return render_template('dashboard.html', hosted_events=hosted_events, attending_events=attending_events)
+    # Precomputed "you might also like" events (see recommend.py)
+    recommended_events = get_recommended_events(user_id)
+
+    return render_template('dashboard.html', hosted_events=hosted_events, attending_events=attending_events,
+                           recommended_events=recommended_events)
 
 @app.route('/profile')
 @login_required
@@ -109,24 +146,16 @@ def profile():
 @login_required
 def hosted_events():
     user_id = session['user']['id']
-    hosted_events = get_events_by_host(user_id) or []
-    return render_template('hosted_events.html', hosted_events=hosted_events)
+    # Stream the page so large lists don't have to be built in memory first
+    return stream_page('hosted_events.html', hosted_events=iter_events_by_host(user_id))
 
 @app.route('/attending_events')
 @login_required
 def attending_events():
     user_id = session['user']['id']
 
-    # Fetch all RSVPs for the user
-    rsvps = get_rsvps_by_user(user_id) or []
-
-    # Create a set to store unique event IDs (to avoid duplicate entries)
-    unique_event_ids = set(rsvp[1] for rsvp in rsvps if rsvp)
-
-    # Use the unique event IDs to get the event details
-    attending_events = [get_event_by_id(event_id) for event_id in unique_event_ids]
-
-    return render_template('attending_events.html', attending_events=attending_events)
+    # Fetch each event the user RSVP'd to once, in a single query, and stream the page
+    return stream_page('attending_events.html', attending_events=iter_events_by_attendee(user_id))
 
 @app.route('/create_event', methods=['GET', 'POST'])
 @login_required
@@ -151,6 +180,8 @@ def create_event_route():
         user_id = session['user']['id']
         add_rsvp(user_id, event_id, guests=1)
 
+        suggest_index.add_event(get_event_by_id(event_id), get_rsvp_count(event_id))
+
         return redirect(url_for('dashboard'))
 
     return render_template('create_event.html')
@@ -172,6 +203,7 @@ def edit_event_route(event_id):
             'capacity': int(request.form['capacity'])
         }
         update_event(event_id, event_data)
+        suggest_index.update_event(get_event_by_id(event_id))
         return redirect(url_for('dashboard'))
 
     return render_template('edit_event.html', event=event)
@@ -185,6 +217,7 @@ def delete_event_route(event_id):
 
     delete_rsvps_for_event(event_id)
     delete_event(event_id)
+    suggest_index.remove_event(event_id)
     return redirect(url_for('dashboard'))
 
 @app.route('/rsvp/<int:event_id>', methods=['POST'])
@@ -203,10 +236,11 @@ def rsvp_route(event_id):
     # Check if the RSVP exceeds the event capacity
     if total_rsvp_guests + guests > event.capacity:
         error_msg = f"Error: The number of guests exceeds the event capacity of {event.capacity} guests."
-        return render_template('event_details.html', event=event, error=error_msg)
+        return render_event_details(event, error=error_msg)
 
     # Proceed with the RSVP if within the allowed capacity
     add_rsvp(user_id, event_id, guests)
+    suggest_index.set_event_popularity(event_id, get_rsvp_count(event_id))
 
     return redirect(url_for('event_details_route', event_id=event_id))
 
@@ -216,38 +250,28 @@ def search():
     if not query:
         return redirect(url_for('dashboard'))
 
-    # Query the database for matching events based on location, event name, host name, keywords, and category
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    search_query = f"""
-        SELECT events.*, users.username AS host_name
-        FROM events
-        JOIN users ON events.host_id = users.id
-        WHERE LOWER(events.name) LIKE ?
-        OR LOWER(events.location) LIKE ?
-        OR LOWER(users.username) LIKE ?
-        OR LOWER(events.description) LIKE ?
-        OR LOWER(events.category) LIKE ?
-    """
-
-    like_query = f"%{query}%"
-    cursor.execute(search_query, (like_query, like_query, like_query, like_query, like_query))
-    events = cursor.fetchall()
-
-    conn.close()
+    # Stream matching events based on location, event name, host name, keywords, and category
+    return stream_page('search_results.html', events=iter_search_events(query), query=query)
 
-    return render_template('search_results.html', events=events, query=query)
+@app.route('/api/suggest', methods=['GET'])
+@login_required
+def suggest():
+    # Typeahead suggestions for the search box, answered from the in-memory index
+    query = request.args.get('q', '')
+    return jsonify(query=query, suggestions=suggest_index.suggest(query))
 
 @app.route('/view_events')
 @login_required
 def view_events():
-    # Fetch all events from the database
-    events = get_events()
+    # Lazily fetch events from the database and stream them into the template
+    return stream_page('view_events.html', events=iter_events(), page='view_events')
 
-    # Pass the list of events to the template
-    return render_template('view_events.html', events=events, page='view_events')
 
+def render_event_details(event, **context):
+    """Render event_details.html with the same context on every code path."""
+    # Precomputed "people who RSVP'd to this also attended..." events (see recommend.py)
+    similar_events = get_similar_events(event.id)
+    return render_template('event_details.html', event=event, similar_events=similar_events, **context)
 
 @app.route('/event/<int:event_id>')
 @login_required
@@ -268,7 +292,121 @@ def event_details_route(event_id):
     if rsvp:
         attending_guests = rsvp[0] - 1  # Subtract 1 to exclude the user
 
-    return render_template('event_details.html', event=event, attending_guests=attending_guests)
+    return render_event_details(event, attending_guests=attending_guests)
+
+# Guest list paging defaults (the exports return the full list unless a page is requested)
+ROSTER_PAGE_SIZE = 100
+ROSTER_MAX_PAGE_SIZE = 1000
+ROSTER_FIELDS = ['user_id', 'username', 'first_name', 'last_name', 'email', 'guests']
+
+# User-entered roster fields, and the leading characters a spreadsheet would treat as a formula
+ROSTER_TEXT_FIELDS = {'username', 'first_name', 'last_name', 'email'}
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def csv_safe(value):
+    """Prefix a cell with ' so spreadsheets don't evaluate it as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def roster_query_args(paged):
+    """Read sort/order/page/per_page from the query string for the roster routes."""
+    sort = request.args.get('sort', 'rsvp')
+    descending = request.args.get('order', 'asc') == 'desc'
+    if not paged and 'page' not in request.args:
+        return sort, descending, None, 0
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = request.args.get('per_page', ROSTER_PAGE_SIZE, type=int)
+    per_page = min(max(per_page, 1), ROSTER_MAX_PAGE_SIZE)
+    return sort, descending, per_page, (page - 1) * per_page
+
+def roster_headers(event_id, filename):
+    total_rsvps, headcount = get_event_roster_totals(event_id)
+    return {
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Total-RSVPs': str(total_rsvps),
+        'X-Total-Headcount': str(headcount),
+    }
+
+def roster_csv(rows):
+    # Write rows into a small buffer and hand it out in chunks
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ROSTER_FIELDS)
+    for row in rows:
+        writer.writerow([csv_safe(row[field]) if field in ROSTER_TEXT_FIELDS else row[field]
+                         for field in ROSTER_FIELDS])
+        if buffer.tell() >= 8192:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+def roster_jsonl(rows):
+    # Batch lines into ~8 KB chunks like roster_csv, rather than one write per row
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps({field: row[field] for field in ROSTER_FIELDS}) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= 8192:
+            yield ''.join(lines)
+            lines = []
+            size = 0
+    yield ''.join(lines)
+
+@app.route('/event/<int:event_id>/guests')
+@login_required
+def event_guests_route(event_id):
+    event = get_event_by_id(event_id)
+    if not event or event.host_id != session['user']['id']:
+        return "Unauthorized", 403
+
+    sort, descending, per_page, offset = roster_query_args(paged=True)
+    try:
+        guests = iter_event_roster(event_id, sort, descending, per_page, offset)
+    except ValueError as e:
+        return str(e), 400
+
+    total_rsvps, headcount = get_event_roster_totals(event_id)
+    return stream_page('event_guests.html', event=event, guests=guests,
+                           total_rsvps=total_rsvps, headcount=headcount,
+                           page_number=offset // per_page + 1, per_page=per_page,
+                           sort=sort, order='desc' if descending else 'asc')
+
+@app.route('/event/<int:event_id>/guests.csv')
+@login_required
+def event_guests_csv_route(event_id):
+    event = get_event_by_id(event_id)
+    if not event or event.host_id != session['user']['id']:
+        return "Unauthorized", 403
+
+    sort, descending, limit, offset = roster_query_args(paged=False)
+    try:
+        rows = iter_event_roster(event_id, sort, descending, limit, offset)
+    except ValueError as e:
+        return str(e), 400
+
+    return Response(stream_with_context(roster_csv(rows)), mimetype='text/csv',
+                    headers=roster_headers(event_id, f'event_{event_id}_guests.csv'))
+
+@app.route('/event/<int:event_id>/guests.jsonl')
+@login_required
+def event_guests_jsonl_route(event_id):
+    event = get_event_by_id(event_id)
+    if not event or event.host_id != session['user']['id']:
+        return "Unauthorized", 403
+
+    sort, descending, limit, offset = roster_query_args(paged=False)
+    try:
+        rows = iter_event_roster(event_id, sort, descending, limit, offset)
+    except ValueError as e:
+        return str(e), 400
+
+    return Response(stream_with_context(roster_jsonl(rows)), mimetype='application/x-ndjson',
+                    headers=roster_headers(event_id, f'event_{event_id}_guests.jsonl'))
 
 @app.route('/edit_rsvp/<int:event_id>', methods=['GET', 'POST'])
 @login_required
@@ -300,10 +438,11 @@ def edit_rsvp_route(event_id):
         # Check if the new RSVP exceeds the event capacity
         if total_rsvp_guests + new_guests > event.capacity:
             error_msg = f"Error: The new number of guests exceeds the event capacity of {event.capacity} guests."
-            return render_template('event_details.html', event=event, error=error_msg)
+            return render_event_details(event, error=error_msg)
 
         # Update the RSVP with the new guest count
         update_rsvp(user_id, event_id, new_guests)
+        suggest_index.set_event_popularity(event_id, get_rsvp_count(event_id))
 
         return redirect(url_for('event_details_route', event_id=event_id))
 
@@ -314,6 +453,7 @@ def remove_rsvp_route(event_id):
 
     # Call the correct remove_rsvp function from event_manage.py
     remove_rsvp(user_id, event_id)
+    suggest_index.set_event_popularity(event_id, get_rsvp_count(event_id))
 
     return redirect(url_for('event_details_route', event_id=event_id))
 
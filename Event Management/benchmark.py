@@ -0,0 +1,263 @@
+"""
+Benchmarks, run against a throwaway database so users.db is never touched:
+
+    python benchmark.py view_events    # TTFB and peak memory of /view_events (50k events)
+    python benchmark.py roster         # peak memory of the guest list exports (100k RSVPs)
+    python benchmark.py suggest        # /api/suggest index latency and memory (50k events)
+    python benchmark.py recommend      # full and incremental recommend.refresh() (1M RSVPs)
+
+Peak memory is measured with tracemalloc while the response body is
+drained, without keeping the body around.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Used if the real template isn't available (e.g. running from a bare checkout)
+FALLBACK_TEMPLATES = {
+    'view_events.html': '<ul>{% for event in events %}<li>{{ event.name }} - {{ event.location }} '
+                        '({{ event.host_name }})</li>{% endfor %}</ul>',
+}
+
+
+def _use_temp_database():
+    """Switch to a temporary directory so users.db is created there."""
+    os.chdir(tempfile.mkdtemp(prefix='event_bench_'))
+    sys.path.insert(0, HERE)
+
+
+def _load_app():
+    """Use a temporary database and import the app."""
+    _use_temp_database()
+    from jinja2 import ChoiceLoader, DictLoader
+    from app import app
+    app.jinja_loader = ChoiceLoader([app.jinja_loader, DictLoader(FALLBACK_TEMPLATES)])
+    app.jinja_env.loader = app.jinja_loader
+    return app
+
+
+def _seed_host(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO users (username, hashed_password, email, first_name, last_name)
+        VALUES ('bench_host', 'x', 'bench_host@example.com', 'Bench', 'Host')
+    ''')
+    return cursor.lastrowid
+
+
+def _logged_in_client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+        session['user'] = {'id': user_id}
+    return client
+
+
+def _measure(client, url, headers=None):
+    """Return (status, time to first byte, total time, body bytes, chunks, peak traced memory)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, headers=headers or {}, buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks, b''))
+    count = 1
+    ttfb = time.perf_counter() - start
+    for chunk in chunks:
+        size += len(chunk)
+        count += 1
+    total = time.perf_counter() - start
+    response.close()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return response.status, ttfb, total, size, count, peak
+
+
+def _report(label, status, ttfb, total, size, count, peak):
+    print(f"{label}: {status}, TTFB {ttfb * 1000:.1f} ms, total {total:.2f}s, "
+          f"{size / 1024:.0f} KB sent in {count} chunks, peak {peak / 1024 / 1024:.1f} MB")
+
+
+def bench_view_events(n_events=50000):
+    app = _load_app()
+    from init import get_db_connection
+
+    conn = get_db_connection()
+    host_id = _seed_host(conn)
+    conn.executemany('''
+        INSERT INTO events (name, date, time, location, description, capacity, host_id, category)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', ((f'Event {i}', '2026-01-01', '18:00', f'Hall {i % 50}', 'Benchmark event', 100, host_id, 'Other')
+          for i in range(n_events)))
+    conn.commit()
+    conn.close()
+
+    client = _logged_in_client(app, host_id)
+    print(f"/view_events with {n_events} events")
+    _report('  uncompressed', *_measure(client, '/view_events'))
+    _report('  gzip', *_measure(client, '/view_events', {'Accept-Encoding': 'gzip'}))
+
+
+def bench_roster(n_rsvps=100000):
+    app = _load_app()
+    from init import get_db_connection
+
+    conn = get_db_connection()
+    host_id = _seed_host(conn)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO events (name, date, time, location, description, capacity, host_id, category)
+        VALUES ('Big event', '2026-01-01', '18:00', 'Stadium', 'Benchmark event', ?, ?, 'Other')
+    ''', (n_rsvps * 3, host_id))
+    event_id = cursor.lastrowid
+    conn.executemany('''
+        INSERT INTO users (username, hashed_password, email, first_name, last_name)
+        VALUES (?, 'x', ?, 'Guest', ?)
+    ''', ((f'guest{i}', f'guest{i}@example.com', f'Number{i}') for i in range(n_rsvps)))
+    conn.execute('''
+        INSERT INTO rsvps (user_id, event_id, guests)
+        SELECT id, ?, 1 + id % 3 FROM users WHERE username LIKE 'guest%'
+    ''', (event_id,))
+    conn.commit()
+    conn.close()
+
+    client = _logged_in_client(app, host_id)
+    print(f"Guest list exports with {n_rsvps} RSVPs")
+    _report('  csv', *_measure(client, f'/event/{event_id}/guests.csv'))
+    _report('  csv sorted by last name', *_measure(client, f'/event/{event_id}/guests.csv?sort=last_name'))
+    _report('  jsonl', *_measure(client, f'/event/{event_id}/guests.jsonl'))
+
+
+def _percentile(timings, fraction):
+    return sorted(timings)[int(len(timings) * fraction)]
+
+
+def bench_suggest(n_events=50000, n_hosts=2000, n_queries=10000):
+    _use_temp_database()
+    from init import get_db_connection, sys_init
+    import suggest
+
+    sys_init()
+    rng = random.Random(0)
+    syllables = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'to', 'vi', 'ze', 'bar', 'den', 'fol', 'gri', 'jam', 'pel']
+    word = lambda: ''.join(rng.choices(syllables, k=rng.randint(2, 4)))
+    categories = ['Music', 'Sports', 'Tech', 'Art', 'Food', 'Education', 'Networking', 'Health', 'Film', 'Other']
+    locations = [word().title() + ' Hall' for _ in range(500)]
+
+    conn = get_db_connection()
+    conn.executemany('''
+        INSERT INTO users (username, hashed_password, email) VALUES (?, 'x', ?)
+    ''', ((f'host_{i}', f'host_{i}@example.com') for i in range(n_hosts)))
+    conn.executemany('''
+        INSERT INTO events (name, date, time, location, description, capacity, host_id, category)
+        VALUES (?, '2026-01-01', '18:00', ?, '', 1000, ?, ?)
+    ''', ((f'{word()} {word()} {word()}'.title(), rng.choice(locations), rng.randint(1, n_hosts),
+           rng.choice(categories)) for _ in range(n_events)))
+    conn.execute('''
+        INSERT INTO rsvps (user_id, event_id, guests)
+        SELECT host_id, id, ABS(RANDOM()) % 200 FROM events
+    ''')
+    conn.commit()
+    conn.close()
+
+    # Memory actually held by the index is measured with tracemalloc;
+    # memory_report() (based on sys.getsizeof) gives the per-structure split
+    tracemalloc.start()
+    start = time.perf_counter()
+    suggest.suggest_index.load()
+    elapsed = time.perf_counter() - start
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"Suggest index over {n_events} events loaded in {elapsed:.2f}s")
+
+    held_mb = held / 1024 / 1024
+    budget_mb = suggest.SUGGEST_MEMORY_BUDGET / 1024 / 1024
+    report = suggest.suggest_index.memory_report()
+    print(f"  memory: {held_mb:.1f} MB of {budget_mb:.0f} MB budget "
+          f"({'within' if held_mb <= budget_mb else 'OVER'} budget; "
+          f"{report['entries']} entries, {report['keys']} keys, {report['buckets']} buckets)")
+    print("  memory_report() breakdown (getsizeof, excludes shared objects):")
+    for part in ('key_bytes', 'bucket_bytes', 'entry_bytes', 'event_bytes'):
+        print(f"    {part[:-6]}: {report[part] / 1024 / 1024:.1f} MB")
+
+    # Queries are 1-6 character prefixes of words users would actually type
+    labels = [entry['label'] for entry in suggest.suggest_index._entries.values()]
+    queries = []
+    for _ in range(n_queries):
+        text = rng.choice(rng.choice(labels).split())
+        queries.append(text[:rng.randint(1, 6)])
+
+    for label, cache_len in (('cached', suggest.SUGGEST_CACHE_PREFIX_LEN), ('uncached', 0)):
+        suggest.SUGGEST_CACHE_PREFIX_LEN = cache_len
+        suggest.suggest_index._cache = {}
+        timings = []
+        for q in queries:
+            start = time.perf_counter()
+            suggest.suggest_index.suggest(q)
+            timings.append(time.perf_counter() - start)
+        p99 = _percentile(timings, 0.99) * 1000
+        print(f"  {label}: p50 {_percentile(timings, 0.5) * 1000:.3f} ms, p99 {p99:.3f} ms "
+              f"({'within' if p99 < 1 else 'OVER'} 1 ms target)")
+
+
+def bench_recommend(n_rsvps=1000000, n_users=200000, n_events=50000, n_new=1000):
+    _use_temp_database()
+    import numpy as np
+    from init import get_db_connection, sys_init
+    import recommend
+
+    sys_init()
+    # Skewed popularity: a few popular events, many small ones
+    rng = np.random.default_rng(0)
+    popularity = 1.0 / np.arange(1, n_events + 1) ** 0.8
+    popularity /= popularity.sum()
+
+    def add_rsvps(count):
+        event_ids = rng.choice(n_events, size=count, p=popularity) + 1
+        user_ids = rng.integers(1, n_users + 1, size=count)
+        conn = get_db_connection()
+        conn.executemany('INSERT INTO rsvps (user_id, event_id, guests) VALUES (?, ?, 1)',
+                         zip(user_ids.tolist(), event_ids.tolist()))
+        conn.commit()
+        conn.close()
+
+    start = time.perf_counter()
+    add_rsvps(n_rsvps)
+    print(f"Seeded {n_rsvps} RSVPs ({n_users} users, {n_events} events) in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    refreshed_events, refreshed_users = recommend.refresh()
+    print(f"  full refresh: {time.perf_counter() - start:.1f}s "
+          f"({refreshed_events} events, {refreshed_users} users)")
+
+    conn = get_db_connection()
+    rows = conn.execute('SELECT (SELECT COUNT(*) FROM event_recommendations), '
+                        '(SELECT COUNT(*) FROM user_recommendations)').fetchone()
+    conn.close()
+    print(f"    wrote {rows[0]} event and {rows[1]} user recommendation rows")
+
+    add_rsvps(n_new)
+    start = time.perf_counter()
+    refreshed_events, refreshed_users = recommend.refresh(incremental=True)
+    print(f"  incremental refresh after {n_new} new RSVPs: {time.perf_counter() - start:.1f}s "
+          f"({refreshed_events} of {n_events} events, {refreshed_users} users recomputed)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the streamed pages on a temporary database.')
+    parser.add_argument('page', choices=['view_events', 'roster', 'suggest', 'recommend'])
+    args = parser.parse_args()
+
+    if args.page == 'view_events':
+        bench_view_events()
+    elif args.page == 'roster':
+        bench_roster()
+    elif args.page == 'suggest':
+        bench_suggest()
+    elif args.page == 'recommend':
+        bench_recommend()
@@ -0,0 +1,143 @@
+import zlib
+
+# brotli is optional; fall back to gzip only if it isn't installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this (in bytes) are not worth compressing
+COMPRESS_MIN_SIZE = 500
+
+# Streamed output is flushed to the client once this many bytes have been buffered
+COMPRESS_FLUSH_SIZE = 8192
+
+# Only text-like responses are compressed (images etc. are already compressed)
+COMPRESS_MIMETYPES = {
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'application/javascript',
+    'application/json',
+    'application/x-ndjson',
+}
+
+
+class _GzipStream:
+    """Incremental gzip encoder with the same interface as brotli.Compressor."""
+
+    def __init__(self):
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def process(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def _parse_accept_encoding(accept_encoding):
+    """Parse an Accept-Encoding header into a {coding: q-value} dict."""
+    qualities = {}
+    for token in accept_encoding.split(','):
+        coding, _, params = token.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+    return qualities
+
+
+def _choose_encoding(accept_encoding):
+    """Pick the best encoding the client accepts (q > 0), or None.
+    Brotli wins ties since it compresses HTML better."""
+    qualities = _parse_accept_encoding(accept_encoding)
+    supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = qualities.get(coding, qualities.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _new_compressor(encoding):
+    if encoding == 'br':
+        return brotli.Compressor(quality=4)
+    return _GzipStream()
+
+
+def _compress_stream(chunks, compressor):
+    """Compress an iterable of chunks, flushing every COMPRESS_FLUSH_SIZE
+    bytes so the browser can start rendering before the whole page is
+    generated."""
+    try:
+        buffered = []
+        buffered_size = 0
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            buffered.append(chunk)
+            buffered_size += len(chunk)
+            if buffered_size >= COMPRESS_FLUSH_SIZE:
+                yield compressor.process(b''.join(buffered)) + compressor.flush()
+                buffered = []
+                buffered_size = 0
+        yield compressor.process(b''.join(buffered)) + compressor.finish()
+    finally:
+        # Make sure the underlying generator (and its DB cursor) is closed
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response, accept_encoding):
+    """Compress a Flask response in place if the client supports it."""
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if 'Content-Range' in response.headers:
+        # Compressing a byte range would break Range requests
+        return response
+    if 'Content-Encoding' in response.headers:
+        return response
+    if response.mimetype not in COMPRESS_MIMETYPES:
+        return response
+
+    encoding = _choose_encoding(accept_encoding or '')
+    if encoding is None:
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    if response.is_streamed:
+        # Streamed pages have no known length; compress them chunk by chunk
+        response.response = _compress_stream(response.response, _new_compressor(encoding))
+        response.direct_passthrough = False
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        compressor = _new_compressor(encoding)
+        response.set_data(compressor.process(data) + compressor.finish())
+
+    response.headers['Content-Encoding'] = encoding
+    # The compressed body is a different representation: byte ranges of it
+    # aren't served, and its ETag must not match the uncompressed one
+    response.headers.pop('Accept-Ranges', None)
+    etag, _ = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak=True)
+    return response
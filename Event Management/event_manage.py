@@ -74,6 +74,36 @@ def get_events():
     return [Event(*event) for event in events]
 
 
+# Number of rows pulled from the cursor at a time when streaming events
+STREAM_CHUNK_SIZE = 500
+
+
+# Helper generator that yields rows from a query without loading them all at once
+def _iter_rows(query, params=()):
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(STREAM_CHUNK_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+    finally:
+        conn.close()
+
+
+# Function to lazily iterate over all events (used by streamed list pages)
+def iter_events():
+    for event in _iter_rows('''
+        SELECT events.*, users.username AS host_name
+        FROM events
+        JOIN users ON events.host_id = users.id
+    '''):
+        yield Event(*event)
+
+
 # Function to get events by host (user) ID
 def get_events_by_host(host_id):
     conn = get_db_connection()
@@ -89,6 +119,28 @@ def get_events_by_host(host_id):
     return [Event(*event) for event in events]
 
 
+# Function to lazily iterate over events hosted by a user
+def iter_events_by_host(host_id):
+    for event in _iter_rows('''
+        SELECT events.*, users.username AS host_name
+        FROM events
+        JOIN users ON events.host_id = users.id
+        WHERE events.host_id = ?
+    ''', (host_id,)):
+        yield Event(*event)
+
+
+# Function to lazily iterate over the distinct events a user has RSVP'd to
+def iter_events_by_attendee(user_id):
+    for event in _iter_rows('''
+        SELECT events.*, users.username AS host_name
+        FROM events
+        JOIN users ON events.host_id = users.id
+        WHERE events.id IN (SELECT event_id FROM rsvps WHERE user_id = ?)
+    ''', (user_id,)):
+        yield Event(*event)
+
+
 # Function to get RSVPs by user ID
 def get_rsvps_by_user(user_id):
     conn = get_db_connection()
@@ -164,6 +216,48 @@ def get_event_guests(event_id):
     return guests
 
 
+# Columns the event roster can be sorted by
+ROSTER_SORT_COLUMNS = {
+    'rsvp': 'rsvps.id',
+    'username': 'users.username',
+    'first_name': 'users.first_name',
+    'last_name': 'users.last_name',
+    'guests': 'rsvps.guests',
+}
+
+
+# Function to get the roster size for an event (number of RSVPs and total headcount)
+def get_event_roster_totals(event_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT COUNT(*) AS rsvps, COALESCE(SUM(guests), 0) AS headcount
+        FROM rsvps
+        WHERE event_id = ?
+    ''', (event_id,))
+    totals = cursor.fetchone()
+    conn.close()
+    return totals['rsvps'], totals['headcount']
+
+
+# Function to lazily iterate over an event's guest list joined with user details
+def iter_event_roster(event_id, sort='rsvp', descending=False, limit=None, offset=0):
+    if sort not in ROSTER_SORT_COLUMNS:
+        raise ValueError(f"Cannot sort roster by '{sort}'")
+    order = 'DESC' if descending else 'ASC'
+    query = f'''
+        SELECT users.id AS user_id, users.username, users.first_name, users.last_name,
+               users.email, rsvps.guests
+        FROM rsvps
+        JOIN users ON rsvps.user_id = users.id
+        WHERE rsvps.event_id = ?
+        ORDER BY {ROSTER_SORT_COLUMNS[sort]} {order}, rsvps.id {order}
+        LIMIT ? OFFSET ?
+    '''
+    # SQLite treats a negative LIMIT as "no limit"
+    return _iter_rows(query, (event_id, -1 if limit is None else limit, offset))
+
+
 # Function to update an event
 def update_event(event_id, event_data):
     conn = get_db_connection()
@@ -231,6 +325,22 @@ def search_events(query):
     return [Event(*event) for event in events]
 
 
+# Function to lazily iterate over events matching a search query
+# (matches name, location, host username, description and category)
+def iter_search_events(query):
+    like_query = f'%{query.lower()}%'
+    return _iter_rows('''
+        SELECT events.*, users.username AS host_name
+        FROM events
+        JOIN users ON events.host_id = users.id
+        WHERE LOWER(events.name) LIKE ?
+        OR LOWER(events.location) LIKE ?
+        OR LOWER(users.username) LIKE ?
+        OR LOWER(events.description) LIKE ?
+        OR LOWER(events.category) LIKE ?
+    ''', (like_query, like_query, like_query, like_query, like_query))
+
+
 # Function to get an event by ID
 def get_event_by_id(event_id):
     conn = get_db_connection()
@@ -256,3 +366,39 @@ def delete_rsvps_for_event(event_id):
     cursor.execute('DELETE FROM rsvps WHERE event_id = ?', (event_id,))
     conn.commit()
     conn.close()
+
+
+# Function to get events similar to an event (precomputed by recommend.py)
+def get_similar_events(event_id, limit=5):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT events.*, users.username AS host_name
+        FROM event_recommendations
+        JOIN events ON events.id = event_recommendations.similar_event_id
+        JOIN users ON events.host_id = users.id
+        WHERE event_recommendations.event_id = ?
+        ORDER BY event_recommendations.rank
+        LIMIT ?
+    ''', (event_id, limit))
+    events = cursor.fetchall()
+    conn.close()
+    return [Event(*event) for event in events]
+
+
+# Function to get recommended events for a user (precomputed by recommend.py)
+def get_recommended_events(user_id, limit=5):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT events.*, users.username AS host_name
+        FROM user_recommendations
+        JOIN events ON events.id = user_recommendations.event_id
+        JOIN users ON events.host_id = users.id
+        WHERE user_recommendations.user_id = ?
+        ORDER BY user_recommendations.rank
+        LIMIT ?
+    ''', (user_id, limit))
+    events = cursor.fetchall()
+    conn.close()
+    return [Event(*event) for event in events]
@@ -58,6 +58,35 @@ def sys_init():
         )
     ''')
 
+    # Index RSVPs by event so guest lists and headcounts don't scan the whole table
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_rsvps_event_id ON rsvps (event_id)')
+
+    # Create tables holding precomputed recommendations (filled by recommend.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS event_recommendations (
+            event_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            similar_event_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY(event_id, rank)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_recommendations (
+            user_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            event_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY(user_id, rank)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recommendation_state (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+
     conn.commit()  # Commit the changes to the database
     conn.close()  # Close the database connection
 
@@ -0,0 +1,252 @@
+"""
+Offline job that computes "people who RSVP'd to this also attended..."
+recommendations from co-attendance.
+
+The rsvps table is loaded into a sparse user x event matrix. Event-to-event
+similarity is the cosine of their attendee sets, and a user's recommended
+events are the events most similar to the ones they already RSVP'd to. The
+results are written to the event_recommendations and user_recommendations
+tables, which the app reads with a single indexed lookup per page view.
+
+Run it periodically, e.g. from cron:
+
+    python recommend.py                 # full rebuild
+    python recommend.py --incremental   # only users/events with new RSVPs
+
+`python benchmark.py recommend` times both modes end to end on 1M RSVPs.
+
+Requires numpy and scipy (only this job does; the web app doesn't).
+"""
+import argparse
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from init import get_db_connection, sys_init
+
+# Number of similar events stored per event and recommendations stored per user
+TOP_K = 10
+
+# Rows of the matrix processed per sparse product, to bound peak memory
+BLOCK_SIZE = 2000
+
+# Rows read from the database at a time when loading RSVPs
+FETCH_SIZE = 50000
+
+
+def load_rsvps(conn):
+    """Load (rsvp_id, user_id, event_id) columns of the rsvps table as arrays."""
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, user_id, event_id FROM rsvps')
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        chunks.append(np.array([tuple(row) for row in rows], dtype=np.int64))
+    if not chunks:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    data = np.concatenate(chunks)
+    return data[:, 0], data[:, 1], data[:, 2]
+
+
+def build_matrix(user_ids, event_ids):
+    """Build a binary user x event matrix.
+
+    Returns the matrix, the sorted user and event ids that its rows and
+    columns correspond to, and the row/column of every input RSVP.
+    """
+    users, user_rows = np.unique(user_ids, return_inverse=True)
+    events, event_cols = np.unique(event_ids, return_inverse=True)
+    matrix = csr_matrix((np.ones(len(user_rows), dtype=np.float32), (user_rows, event_cols)),
+                        shape=(len(users), len(events)))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1.0  # several RSVPs to the same event count once
+    return matrix, users, events, user_rows, event_cols
+
+
+def top_k_rows(matrix, k):
+    """Yield (row, columns, scores) for the k largest entries of each row of a CSR matrix."""
+    indptr, indices, data = matrix.indptr, matrix.indices, matrix.data
+    for row in range(matrix.shape[0]):
+        start, end = indptr[row], indptr[row + 1]
+        if start == end:
+            continue
+        scores = data[start:end]
+        cols = indices[start:end]
+        if end - start > k:
+            top = np.argpartition(-scores, k)[:k]
+            scores, cols = scores[top], cols[top]
+        order = np.lexsort((cols, -scores))
+        yield row, cols[order], scores[order]
+
+
+def similar_events(matrix, event_cols, k=TOP_K, block_size=BLOCK_SIZE):
+    """Compute the top-k most similar events for the given event columns.
+
+    Returns (event_col, similar_col, score) arrays.
+    """
+    by_event = matrix.T.tocsr()  # event x user
+    norms = np.sqrt(np.asarray(matrix.sum(axis=0)).ravel())
+    results = []
+    for start in range(0, len(event_cols), block_size):
+        block = event_cols[start:start + block_size]
+        # Co-attendance counts between the block's events and every event
+        co = (by_event[block] @ matrix).tocsr()
+        rows = np.repeat(np.arange(len(block)), np.diff(co.indptr))
+        co.data /= norms[block][rows] * norms[co.indices]
+        co.data[co.indices == block[rows]] = 0.0  # an event isn't similar to itself
+        co.eliminate_zeros()
+        for row, cols, scores in top_k_rows(co, k):
+            results.append((np.full(len(cols), block[row]), cols, scores))
+    return _concat_triples(results)
+
+
+def recommend_for_users(matrix, similarity, user_rows, k=TOP_K, block_size=BLOCK_SIZE):
+    """Score events for the given users by summing the similarity of each
+    event to the events they already RSVP'd to, skipping those events.
+
+    Returns (user_row, event_col, score) arrays.
+    """
+    results = []
+    for start in range(0, len(user_rows), block_size):
+        block = user_rows[start:start + block_size]
+        attended = matrix[block]
+        scores = (attended @ similarity).tocsr()
+        scores = scores - scores.multiply(attended)  # don't recommend what they already attend
+        scores.eliminate_zeros()
+        for row, cols, values in top_k_rows(scores.tocsr(), k):
+            results.append((np.full(len(cols), block[row]), cols, values))
+    return _concat_triples(results)
+
+
+def _concat_triples(results):
+    if not results:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    rows, cols, scores = zip(*results)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(scores)
+
+
+def _ranked_rows(keys, values, scores):
+    """Turn triples (already grouped by key and sorted by score) into
+    (key, rank, value, score) tuples for insertion."""
+    ranks = np.zeros(len(keys), dtype=np.int64)
+    if len(keys):
+        starts = np.r_[True, keys[1:] != keys[:-1]]
+        group_start = np.maximum.accumulate(np.where(starts, np.arange(len(keys)), 0))
+        ranks = np.arange(len(keys)) - group_start + 1
+    return list(zip(keys.tolist(), ranks.tolist(), values.tolist(), scores.astype(float).tolist()))
+
+
+def _load_similarity(conn, events):
+    """Load stored event similarities, mapped onto the current matrix columns."""
+    cursor = conn.cursor()
+    cursor.execute('SELECT event_id, similar_event_id, score FROM event_recommendations')
+    rows = cursor.fetchall()
+    if not rows or not len(events):
+        return _concat_triples([])
+    data = np.array([tuple(row) for row in rows], dtype=np.float64)
+    event_ids = data[:, 0].astype(np.int64)
+    similar_ids = data[:, 1].astype(np.int64)
+    event_cols = np.clip(np.searchsorted(events, event_ids), 0, len(events) - 1)
+    similar_cols = np.clip(np.searchsorted(events, similar_ids), 0, len(events) - 1)
+    # Drop rows for events that no longer have any RSVPs
+    known = (events[event_cols] == event_ids) & (events[similar_cols] == similar_ids)
+    return event_cols[known], similar_cols[known], data[known, 2].astype(np.float32)
+
+
+def _affected_events(matrix, event_cols):
+    """Return every event whose similarity scores change when the given
+    events gain attendees: the events themselves and every event attended
+    by anyone who attends them (a new attendee changes both the
+    co-attendance count and the event's norm)."""
+    attendees = np.unique(matrix.tocsc()[:, event_cols].indices)
+    return np.unique(matrix[attendees].indices)
+
+
+def _get_last_rsvp_id(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM recommendation_state WHERE key = 'last_rsvp_id'")
+    row = cursor.fetchone()
+    return row['value'] if row else 0
+
+
+def refresh(incremental=False, k=TOP_K):
+    """Recompute recommendations and store them in the database.
+
+    A full refresh rebuilds both tables. An incremental refresh only
+    recomputes recommendations for users with RSVPs since the last run,
+    and similar events for every event whose similarities those RSVPs can
+    have changed; run a full refresh from time to time to pick up
+    cancelled RSVPs.
+
+    The incremental saving is mostly on the user side. A new RSVP to an
+    event changes its similarity to every event its attendees go to, and
+    with skewed popularity a handful of RSVPs to popular events reach
+    almost the whole catalogue: on the 1M RSVP benchmark, 1,000 new RSVPs
+    recompute nearly every event, so the event side costs about as much
+    as a full refresh.
+    """
+    conn = get_db_connection()
+    rsvp_ids, user_ids, event_ids = load_rsvps(conn)
+    matrix, users, events, user_rows, event_cols = build_matrix(user_ids, event_ids)
+    last_rsvp_id = _get_last_rsvp_id(conn)
+
+    if incremental and last_rsvp_id:
+        new = rsvp_ids > last_rsvp_id
+        changed_users = np.unique(user_rows[new])
+        changed_events = _affected_events(matrix, np.unique(event_cols[new]))
+        old_events, old_similar, old_scores = _load_similarity(conn, events)
+        keep = ~np.isin(old_events, changed_events)
+        new_events, new_similar, new_scores = similar_events(matrix, changed_events, k)
+        sim_events = np.concatenate([old_events[keep], new_events])
+        sim_similar = np.concatenate([old_similar[keep], new_similar])
+        sim_scores = np.concatenate([old_scores[keep], new_scores])
+    else:
+        incremental = False
+        changed_events = np.arange(len(events))
+        changed_users = np.arange(len(users))
+        new_events, new_similar, new_scores = similar_events(matrix, changed_events, k)
+        sim_events, sim_similar, sim_scores = new_events, new_similar, new_scores
+
+    similarity = csr_matrix((sim_scores, (sim_events, sim_similar)), shape=(len(events), len(events)))
+    rec_users, rec_events, rec_scores = recommend_for_users(matrix, similarity, changed_users, k)
+
+    cursor = conn.cursor()
+    if incremental:
+        cursor.executemany('DELETE FROM event_recommendations WHERE event_id = ?',
+                           [(int(e),) for e in events[changed_events]])
+        cursor.executemany('DELETE FROM user_recommendations WHERE user_id = ?',
+                           [(int(u),) for u in users[changed_users]])
+    else:
+        cursor.execute('DELETE FROM event_recommendations')
+        cursor.execute('DELETE FROM user_recommendations')
+
+    cursor.executemany('''
+        INSERT INTO event_recommendations (event_id, rank, similar_event_id, score)
+        VALUES (?, ?, ?, ?)
+    ''', _ranked_rows(events[new_events], events[new_similar], new_scores))
+    cursor.executemany('''
+        INSERT INTO user_recommendations (user_id, rank, event_id, score)
+        VALUES (?, ?, ?, ?)
+    ''', _ranked_rows(users[rec_users], events[rec_events], rec_scores))
+    cursor.execute('''
+        INSERT OR REPLACE INTO recommendation_state (key, value) VALUES ('last_rsvp_id', ?)
+    ''', (int(rsvp_ids.max()) if len(rsvp_ids) else last_rsvp_id,))
+    conn.commit()
+    conn.close()
+    return len(changed_events), len(changed_users)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compute co-attendance event recommendations.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only refresh events and users with RSVPs since the last run')
+    args = parser.parse_args()
+
+    sys_init()
+    start = time.perf_counter()
+    n_events, n_users = refresh(incremental=args.incremental)
+    print(f"Refreshed {n_events} events and {n_users} users in {time.perf_counter() - start:.2f}s")
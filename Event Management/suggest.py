@@ -0,0 +1,331 @@
+import heapq
+import sys
+import threading
+from bisect import bisect_left, insort
+from init import get_db_connection
+
+# Maximum number of suggestions returned for a query
+SUGGEST_LIMIT = 10
+
+# Keys are also grouped into buckets by their first few characters, each
+# bucket kept in popularity order
+SUGGEST_BUCKET_LEN = 3
+
+# Prefixes matching at most this many keys are answered by scanning all of
+# them; prefixes matching more walk the popularity-ordered buckets instead
+# and stop as soon as enough matches are found
+SUGGEST_RANGE_SCAN = 200
+
+# Memory the index is expected to stay within at ~50k events
+# (checked by `python benchmark.py suggest`)
+SUGGEST_MEMORY_BUDGET = 128 * 1024 * 1024
+
+# Results for prefixes up to this length are cached until the index changes,
+# since they match the most entries and are typed on every search
+SUGGEST_CACHE_PREFIX_LEN = 3
+
+
+def _word_starts(text):
+    """Return the text (lowercased) starting from each word, so that
+    'Summer Jazz Night' can be found by typing 'sum', 'jazz' or 'night'."""
+    text = ' '.join(text.lower().split())
+    if not text:
+        return []
+    starts = [text]
+    for i, ch in enumerate(text):
+        if ch == ' ':
+            starts.append(text[i + 1:])
+    return starts
+
+
+class SuggestIndex:
+    """In-memory prefix index over event names, categories, locations and
+    host usernames, used to answer typeahead queries without hitting the
+    database.
+
+    Keys are kept in a sorted list of (text, kind, ref) tuples, so all
+    keys that start with a prefix sit next to each other and can be found
+    with bisect. The same keys are also grouped into buckets by their
+    first SUGGEST_BUCKET_LEN characters, each sorted by descending score,
+    so the most popular matches of a broad prefix can be found without
+    looking at every match.
+
+    Scores are on two different scales that share one ranked list: an
+    event's score is its RSVP headcount, while a category, location or
+    host scores the number of events using it. A category used by 3
+    events therefore ranks below an event with 4 guests. This is
+    deliberate: specific events are what most searches are after, and
+    a term only outranks them once it covers more events than the
+    matching events have guests.
+    """
+
+    def __init__(self):
+        self._keys = []         # sorted (text, kind, ref) tuples
+        self._buckets = {}      # text[:SUGGEST_BUCKET_LEN] -> sorted (-score, kind, ref, text) tuples
+        self._bucket_names = [] # sorted bucket names
+        self._entries = {}      # (kind, ref) -> {'label': ..., 'score': ...}
+        self._events = {}       # event_id -> (name, category, location, host_name)
+        self._cache = {}        # short prefix -> cached suggestions
+        self._sorted = True     # False while bulk loading; everything is sorted once at the end
+        self._lock = threading.Lock()
+
+    # --- internal helpers (caller holds the lock) ---
+
+    def _bucket_add(self, item):
+        name = item[3][:SUGGEST_BUCKET_LEN]
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = []
+            if self._sorted:
+                insort(self._bucket_names, name)
+            else:
+                self._bucket_names.append(name)
+        if self._sorted:
+            insort(bucket, item)
+        else:
+            bucket.append(item)
+
+    def _bucket_remove(self, item):
+        name = item[3][:SUGGEST_BUCKET_LEN]
+        bucket = self._buckets[name]
+        i = bisect_left(bucket, item)
+        if i < len(bucket) and bucket[i] == item:
+            del bucket[i]
+        if not bucket:
+            del self._buckets[name]
+            del self._bucket_names[bisect_left(self._bucket_names, name)]
+
+    def _add_entry(self, kind, ref, label, score):
+        self._entries[(kind, ref)] = {'label': label, 'score': score}
+        for text in _word_starts(label):
+            if self._sorted:
+                insort(self._keys, (text, kind, ref))
+            else:
+                self._keys.append((text, kind, ref))
+            self._bucket_add((-score, kind, ref, text))
+
+    def _remove_entry(self, kind, ref):
+        entry = self._entries.pop((kind, ref), None)
+        if entry is None:
+            return
+        for text in _word_starts(entry['label']):
+            key = (text, kind, ref)
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+            self._bucket_remove((-entry['score'], kind, ref, text))
+
+    def _set_score(self, kind, ref, score):
+        entry = self._entries[(kind, ref)]
+        if entry['score'] == score:
+            return
+        for text in _word_starts(entry['label']):
+            self._bucket_remove((-entry['score'], kind, ref, text))
+            self._bucket_add((-score, kind, ref, text))
+        entry['score'] = score
+
+    def _bump_term(self, kind, value, delta):
+        """Adjust the number of events using a category/location/host.
+        Terms disappear when no event uses them."""
+        if not value:
+            return
+        ref = value.lower()
+        entry = self._entries.get((kind, ref))
+        if entry is None:
+            if delta > 0:
+                self._add_entry(kind, ref, value, delta)
+            return
+        if entry['score'] + delta <= 0:
+            self._remove_entry(kind, ref)
+        else:
+            self._set_score(kind, ref, entry['score'] + delta)
+
+    def _add_event(self, event, popularity):
+        fields = (event.name, event.category, event.location, event.host_name)
+        self._events[event.id] = fields
+        self._add_entry('event', event.id, event.name, popularity)
+        self._bump_term('category', event.category, 1)
+        self._bump_term('location', event.location, 1)
+        self._bump_term('host', event.host_name, 1)
+
+    def _remove_event(self, event_id):
+        fields = self._events.pop(event_id, None)
+        if fields is None:
+            return 0
+        name, category, location, host_name = fields
+        popularity = self._entries[('event', event_id)]['score']
+        self._remove_entry('event', event_id)
+        self._bump_term('category', category, -1)
+        self._bump_term('location', location, -1)
+        self._bump_term('host', host_name, -1)
+        return popularity
+
+    def _scan_range(self, start, end, limit):
+        """Rank every key in self._keys[start:end] by score."""
+        best = {}
+        for text, kind, ref in self._keys[start:end]:
+            best[(kind, ref)] = self._entries[(kind, ref)]['score']
+        # Same order as the buckets: highest score first, then (kind, ref)
+        top = heapq.nsmallest(limit, best.items(), key=lambda item: (-item[1], item[0]))
+        return [key for key, score in top]
+
+    def _walk_buckets(self, prefix, limit):
+        """Walk the buckets that can hold `prefix` in popularity order and
+        return the first `limit` distinct matches."""
+        if len(prefix) >= SUGGEST_BUCKET_LEN:
+            bucket = self._buckets.get(prefix[:SUGGEST_BUCKET_LEN], [])
+            items = iter(bucket)
+        else:
+            # Shorter prefixes span several buckets; merge them by score
+            names = self._bucket_names
+            first = bisect_left(names, prefix)
+            last = first
+            while last < len(names) and names[last].startswith(prefix):
+                last += 1
+            items = heapq.merge(*(self._buckets[name] for name in names[first:last]))
+
+        found = []
+        seen = set()
+        for neg_score, kind, ref, text in items:
+            if (kind, ref) in seen or not text.startswith(prefix):
+                continue
+            seen.add((kind, ref))
+            found.append((kind, ref))
+            if len(found) == limit:
+                break
+        return found
+
+    # --- public API ---
+
+    def load(self):
+        """(Re)build the index from the database."""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT events.id, events.name, events.location, events.category,
+                   users.username AS host_name,
+                   COALESCE(totals.guests, 0) AS popularity
+            FROM events
+            JOIN users ON events.host_id = users.id
+            LEFT JOIN (SELECT event_id, SUM(guests) AS guests FROM rsvps GROUP BY event_id) AS totals
+                ON totals.event_id = events.id
+        ''')
+        events = cursor.fetchall()
+        conn.close()
+
+        with self._lock:
+            self._keys = []
+            self._buckets = {}
+            self._bucket_names = []
+            self._entries = {}
+            self._events = {}
+            self._cache = {}
+            self._sorted = False
+            # Count term usage first so each term is added once with its final score
+            terms = {}
+            for row in events:
+                self._events[row['id']] = (row['name'], row['category'], row['location'], row['host_name'])
+                self._add_entry('event', row['id'], row['name'], row['popularity'])
+                for kind, column in (('category', 'category'), ('location', 'location'), ('host', 'host_name')):
+                    value = row[column]
+                    if value:
+                        label, count = terms.get((kind, value.lower()), (value, 0))
+                        terms[(kind, value.lower())] = (label, count + 1)
+            for (kind, ref), (label, count) in terms.items():
+                self._add_entry(kind, ref, label, count)
+            self._keys.sort()
+            self._bucket_names.sort()
+            for bucket in self._buckets.values():
+                bucket.sort()
+            self._sorted = True
+
+    def add_event(self, event, popularity=0):
+        """Index a newly created event."""
+        with self._lock:
+            self._cache = {}
+            self._remove_event(event.id)
+            self._add_event(event, popularity)
+
+    def update_event(self, event):
+        """Re-index an edited event, keeping its popularity."""
+        with self._lock:
+            self._cache = {}
+            popularity = self._remove_event(event.id)
+            self._add_event(event, popularity)
+
+    def remove_event(self, event_id):
+        """Drop a deleted event from the index."""
+        with self._lock:
+            self._cache = {}
+            self._remove_event(event_id)
+
+    def set_event_popularity(self, event_id, popularity):
+        """Update an event's ranking score (its total RSVP headcount)."""
+        with self._lock:
+            self._cache = {}
+            if ('event', event_id) in self._entries:
+                self._set_score('event', event_id, popularity)
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        """Return up to `limit` suggestions whose words start with `query`,
+        most popular first."""
+        prefix = ' '.join(query.lower().split())
+        if not prefix:
+            return []
+
+        with self._lock:
+            cached = self._cache.get((prefix, limit))
+            if cached is not None:
+                return cached
+
+            start = bisect_left(self._keys, (prefix,))
+            end = bisect_left(self._keys, (prefix + '\U0010ffff',), start)
+            if end - start <= SUGGEST_RANGE_SCAN:
+                top = self._scan_range(start, end, limit)
+            else:
+                top = self._walk_buckets(prefix, limit)
+
+            results = []
+            for kind, ref in top:
+                entry = self._entries[(kind, ref)]
+                suggestion = {'type': kind, 'label': entry['label'], 'score': entry['score']}
+                if kind == 'event':
+                    suggestion['event_id'] = ref
+                results.append(suggestion)
+            if len(prefix) <= SUGGEST_CACHE_PREFIX_LEN:
+                self._cache[(prefix, limit)] = results
+            return results
+
+    def memory_report(self):
+        """Approximate memory used by the index, in bytes."""
+        with self._lock:
+            key_bytes = sys.getsizeof(self._keys)
+            for key in self._keys:
+                key_bytes += sys.getsizeof(key) + sys.getsizeof(key[0])
+            bucket_bytes = sys.getsizeof(self._buckets) + sys.getsizeof(self._bucket_names)
+            for bucket in self._buckets.values():
+                bucket_bytes += sys.getsizeof(bucket)
+                for item in bucket:
+                    bucket_bytes += sys.getsizeof(item)
+            entry_bytes = sys.getsizeof(self._entries)
+            for entry in self._entries.values():
+                entry_bytes += sys.getsizeof(entry) + sys.getsizeof(entry['label'])
+            event_bytes = sys.getsizeof(self._events)
+            for fields in self._events.values():
+                event_bytes += sys.getsizeof(fields)
+            return {
+                'keys': len(self._keys),
+                'entries': len(self._entries),
+                'events': len(self._events),
+                'buckets': len(self._buckets),
+                'key_bytes': key_bytes,
+                'bucket_bytes': bucket_bytes,
+                'entry_bytes': entry_bytes,
+                'event_bytes': event_bytes,
+                'total_bytes': key_bytes + bucket_bytes + entry_bytes + event_bytes,
+            }
+
+
+# Shared index used by the app
+suggest_index = SuggestIndex()
+